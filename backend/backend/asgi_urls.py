@@ -0,0 +1,36 @@
+from django.urls import include, path, re_path
+
+from .async_views import async_view
+from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from users.views import UserViewSet
+
+# Самые нагруженные чтения работают асинхронно, остальные маршруты
+# берутся из backend.urls без изменений.
+urlpatterns = [
+    path('api/tags/', async_view(TagViewSet.as_view(
+        {'get': 'list'}, basename='tags', detail=False,
+    ))),
+    path('api/ingredients/', async_view(IngredientViewSet.as_view(
+        {'get': 'list'}, basename='ingredients', detail=False,
+    ))),
+    path('api/recipes/download_shopping_cart/', async_view(
+        RecipeViewSet.as_view(
+            {'get': 'download_shopping_cart'}, basename='recipes',
+            detail=False, **RecipeViewSet.download_shopping_cart.kwargs,
+        )
+    )),
+    re_path(r'^api/recipes/(?P<pk>\d+)/$', async_view(RecipeViewSet.as_view(
+        {
+            'get': 'retrieve',
+            'put': 'update',
+            'patch': 'partial_update',
+            'delete': 'destroy',
+        },
+        basename='recipes', detail=True,
+    ))),
+    path('api/users/subscriptions/', async_view(UserViewSet.as_view(
+        {'get': 'subscriptions'}, basename='users', detail=False,
+        **UserViewSet.subscriptions.kwargs,
+    ))),
+    path('', include('backend.urls')),
+]
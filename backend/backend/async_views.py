@@ -0,0 +1,55 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+# Ограничивает число одновременных обращений к базе из одного процесса
+# и, значит, число его соединений; ожидающие запросы не занимают потоков.
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_WORKERS,
+    thread_name_prefix='async-view',
+)
+
+
+def run_view(view, request, *args, **kwargs):
+    # Потоки пула не получают сигналов request_started/request_finished,
+    # поэтому устаревшие соединения закрываются здесь.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if response.streaming:
+            # ASGIHandler перебирает потоковый ответ в цикле событий,
+            # где запросы к базе запрещены: читаем его здесь.
+            response.streaming_content = list(response.streaming_content)
+            return response
+        if not callable(getattr(response, 'render', None)):
+            return response
+        # Рендерим здесь: иначе ASGIHandler отправит render()
+        # в единственный общий синхронный поток.
+        response.render()
+        rendered = HttpResponse(
+            response.content, status=response.status_code
+        )
+        for header, value in response.items():
+            rendered[header] = value
+        rendered.cookies = response.cookies
+        return rendered
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """
+    Превращает синхронный DRF-view в асинхронный: он выполняется в пуле
+    из ASYNC_VIEW_WORKERS потоков, а цикл событий обслуживает соединения.
+    """
+    run = sync_to_async(run_view, thread_sensitive=False, executor=executor)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,169 @@
+import logging
+import threading
+
+import psycopg2.extras
+from django.conf import settings
+from django.db.backends.postgresql import base
+from psycopg2.pool import ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool, который при исчерпании ждёт свободное
+    соединение до timeout секунд, а не сразу бросает PoolError.
+    Соединения открываются по мере надобности и не закрываются
+    при возврате, пока их не больше max_size.
+    """
+
+    def __init__(self, max_size, timeout, **conn_params):
+        super().__init__(0, max_size, **conn_params)
+        # psycopg2 держит в пуле не больше minconn свободных соединений,
+        # а остальные закрывает при putconn.
+        self.minconn = max_size
+        self.timeout = timeout
+        self.slots = threading.Semaphore(max_size)
+        self.fresh = set()
+
+    def _connect(self, key=None):
+        connection = super()._connect(key)
+        self.fresh.add(id(connection))
+        return connection
+
+    def is_fresh(self, connection):
+        """Соединение только что открыто, а не взято из пула."""
+        if id(connection) in self.fresh:
+            self.fresh.discard(id(connection))
+            return True
+        return False
+
+    def getconn(self, key=None):
+        if not self.slots.acquire(timeout=self.timeout):
+            # Django оборачивает ошибку в django.db.OperationalError.
+            raise psycopg2.OperationalError(
+                f'Нет свободного соединения в пуле за {self.timeout} с'
+            )
+        try:
+            return super().getconn(key)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.slots.release()
+
+
+def required_pool_size():
+    """
+    Потоки процесса, которые держат соединение помимо потоков
+    gunicorn: обработка фото, а под ASGI ещё пул async_view
+    и общий синхронный поток.
+    """
+    size = settings.IMAGE_PIPELINE_WORKERS
+    if settings.ROOT_URLCONF == 'backend.asgi_urls':
+        size += settings.ASYNC_VIEW_WORKERS + 1
+    return size
+
+
+def get_pool(alias, settings_dict, conn_params):
+    # Ключ включает параметры подключения: тестовая база получает свой пул.
+    key = (alias, repr(sorted(conn_params.items())))
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None:
+            max_size = settings_dict['POOL_MAX_SIZE']
+            if max_size < required_pool_size():
+                logger.warning(
+                    'POOL_MAX_SIZE=%d меньше числа потоков процесса, '
+                    'работающих с базой (%d и потоки gunicorn)',
+                    max_size, required_pool_size(),
+                )
+            pool = pools[key] = BlockingConnectionPool(
+                max_size, settings_dict.get('POOL_TIMEOUT', 10), **conn_params
+            )
+    return pool
+
+
+def is_alive(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            # Иначе set_session при подключении упадёт внутри транзакции.
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с проверкой переиспользуемых соединений перед первым
+    запросом (CONN_HEALTH_CHECKS) и необязательным пулом соединений
+    внутри процесса (POOL_MAX_SIZE > 0).
+    """
+    health_check_done = False
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        if not self.settings_dict.get('POOL_MAX_SIZE'):
+            return super().get_new_connection(conn_params)
+        pool = get_pool(self.alias, self.settings_dict, conn_params)
+        connection = pool.getconn()
+        if (
+            self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not pool.is_fresh(connection)
+            and not is_alive(connection)
+        ):
+            pool.putconn(connection, close=True)
+            connection = pool.getconn()
+        self.pool = pool
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        pool, self.pool = self.pool, None
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+
+    def connect(self):
+        # connect() сам вызывает ensure_connection() из set_autocommit():
+        # проверять только что открытое соединение незачем, а SELECT 1
+        # до включения autocommit открыл бы транзакцию.
+        self.health_check_done = True
+        super().connect()
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого запроса.
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and not self.in_atomic_block
+            and self.autocommit
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
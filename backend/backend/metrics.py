@@ -0,0 +1,144 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+
+
+def fingerprint(sql):
+    """Приводит SQL к шаблону: списки IN любой длины совпадают."""
+    return IN_LIST.sub('(%s, ...)', sql)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами в формате Prometheus."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [
+                    [0] * (len(self.buckets) + 1), 0, 0
+                ]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self.lock:
+            snapshot = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self.series.items()
+            ]
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = format_labels(labels)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield (
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            yield f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}'
+            yield f'{self.name}_sum{{{label_text}}} {total}'
+            yield f'{self.name}_count{{{label_text}}} {count}'
+
+
+class Counter:
+    """Счётчик с ограниченным числом серий на одно значение view."""
+
+    def __init__(self, name, documentation, max_series_per_view=20):
+        self.name = name
+        self.documentation = documentation
+        self.max_series_per_view = max_series_per_view
+        self.series = {}
+        self.per_view = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        with self.lock:
+            if labels not in self.series:
+                view = labels[0][1]
+                if self.per_view[view] >= self.max_series_per_view:
+                    return
+                self.per_view[view] += 1
+                self.series[labels] = 0
+            self.series[labels] += value
+
+    def collect(self):
+        with self.lock:
+            snapshot = sorted(self.series.items())
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in snapshot:
+            yield f'{self.name}{{{format_labels(labels)}}} {value}'
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n')
+        .replace('"', '\\"')
+    )
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds', 'Время обработки запроса.',
+    DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'api_request_queries', 'Число SQL-запросов на запрос к API.',
+    QUERY_BUCKETS,
+)
+REQUEST_SQL_DURATION = Histogram(
+    'api_request_sql_seconds', 'Суммарное время SQL на запрос к API.',
+    DURATION_BUCKETS,
+)
+REQUEST_DUPLICATE_QUERIES = Histogram(
+    'api_request_duplicate_queries',
+    'Повторы одинаковых SQL-запросов на запрос к API (признак N+1).',
+    QUERY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'api_response_size_bytes', 'Размер тела ответа.', SIZE_BUCKETS,
+)
+DUPLICATE_FINGERPRINTS = Counter(
+    'api_duplicate_queries_total',
+    'Повторы SQL-запросов по отпечаткам; текст запроса пишется в лог.',
+)
+
+REGISTRY = (
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    REQUEST_SQL_DURATION,
+    REQUEST_DUPLICATE_QUERIES,
+    RESPONSE_SIZE,
+    DUPLICATE_FINGERPRINTS,
+)
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
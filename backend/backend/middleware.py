@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+from .routers import use_replica
+
+logger = logging.getLogger('api.metrics')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_PIN_KEY = 'replica-pin:{}'
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: считает запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            key = metrics.fingerprint(sql)
+            self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+
+    def duplicates(self):
+        return {
+            sql: count - 1
+            for sql, count in self.fingerprints.items() if count > 1
+        }
+
+
+# Recorder запроса хранится в контексте: sync_to_async копирует его
+# в поток, где выполняется view, в том числе под ASGI.
+current_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(connection, **kwargs):
+    """Подключает record_query к соединению один раз."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_recorder, dispatch_uid='query-metrics')
+
+
+@contextmanager
+def record_queries(recorder):
+    """Считает запросы текущего контекста в recorder."""
+    # Соединения, открытые до подключения сигнала.
+    for connection in connections.all():
+        install_recorder(connection)
+    token = current_recorder.set(recorder)
+    try:
+        yield
+    finally:
+        current_recorder.reset(token)
+
+
+class HybridMiddleware:
+    """
+    База для middleware, работающих и под WSGI, и под ASGI без
+    переключения в синхронный поток, по образцу MiddlewareMixin.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+def get_view_name(request, view_func):
+    """RecipeViewSet.list, UserViewSet.subscriptions и т.п."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryMetricsMiddleware(HybridMiddleware):
+    """
+    Собирает по каждому view и действию число и время SQL-запросов,
+    повторяющиеся запросы, размер ответа и время обработки.
+    Метрики хранятся в памяти процесса и отдаются по /api/metrics/.
+    """
+
+    def handle(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        self.finish(request, recorder, started, response)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with record_queries(recorder):
+            response = await self.get_response(request)
+        self.finish(request, recorder, started, response)
+        return response
+
+    def finish(self, request, recorder, started, response):
+        match = request.resolver_match
+        if match is not None:
+            self.record(
+                get_view_name(request, match.func), request.method,
+                recorder, time.perf_counter() - started, response,
+            )
+
+    def record(self, view, method, recorder, duration, response):
+        labels = (('view', view), ('method', method))
+        metrics.REQUEST_DURATION.observe(labels, duration)
+        metrics.REQUEST_QUERIES.observe(labels, recorder.count)
+        metrics.REQUEST_SQL_DURATION.observe(labels, recorder.duration)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(labels, len(response.content))
+        duplicates = recorder.duplicates()
+        metrics.REQUEST_DUPLICATE_QUERIES.observe(
+            labels, sum(duplicates.values())
+        )
+        for sql, count in duplicates.items():
+            digest = hashlib.md5(sql.encode()).hexdigest()[:12]
+            metrics.DUPLICATE_FINGERPRINTS.inc(
+                (('view', view), ('fingerprint', digest)), count
+            )
+            if count >= settings.METRICS_DUPLICATE_THRESHOLD:
+                logger.warning(
+                    '%s %s: запрос %s повторён %d раз: %s',
+                    method, view, digest, count, sql,
+                )
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Разрешает чтение с реплики для безопасных запросов. После записи
+    клиент на REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы
+    сразу видеть свои изменения. Клиент определяется по хэшу заголовка
+    Authorization и по сессии (админка); для работы нескольких
+    процессов нужен общий кэш.
+    """
+
+    def handle(self, request):
+        replica = self.start(request)
+        token = use_replica.set(replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.finish(request)
+        return response
+
+    async def __acall__(self, request):
+        replica = self.start(request)
+        # Контекст копируется в потоки sync_to_async вместе с флагом.
+        token = use_replica.set(replica)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        self.finish(request)
+        return response
+
+    def start(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        # SessionMiddleware ещё не отработал, сессию берём из cookie.
+        pin_keys = self.get_pin_keys(
+            request, request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        return not (pin_keys and cache.get_many(pin_keys))
+
+    def finish(self, request):
+        if request.method in SAFE_METHODS:
+            return
+        # После входа в админку ключ сессии уже новый.
+        session = getattr(request, 'session', None)
+        pin_keys = self.get_pin_keys(
+            request, session.session_key if session is not None else None
+        )
+        if pin_keys:
+            cache.set_many(
+                dict.fromkeys(pin_keys, True), settings.REPLICA_PIN_SECONDS
+            )
+
+    @staticmethod
+    def get_pin_keys(request, session_key):
+        clients = []
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if authorization:
+            clients.append(f'authorization:{authorization}')
+        if session_key:
+            clients.append(f'session:{session_key}')
+        return [
+            REPLICA_PIN_KEY.format(hashlib.sha256(client.encode()).hexdigest())
+            for client in clients
+        ]
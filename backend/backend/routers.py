@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA = 'replica'
+
+# Модели, которые читаются только с основной базы: токен, созданный
+# при входе, должен быть виден сразу, даже если реплика отстаёт.
+PRIMARY_ONLY_MODELS = {'authtoken.token'}
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Читает с основной базы внутри безопасного запроса. Нужно там, где
+    прочитанное кладётся в кэш под текущей версией данных: отстающая
+    реплика сохранила бы под новой версией старые данные.
+    """
+    token = use_replica.set(False)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение на реплику, если её разрешил
+    ReplicaRoutingMiddleware для текущего запроса. Запись, а также
+    чтение вне запросов и в изменяющих запросах идут в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            use_replica.get()
+            and REPLICA in settings.DATABASES
+            and model._meta.label_lower not in PRIMARY_ONLY_MODELS
+        ):
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
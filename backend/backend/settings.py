@@ -1,5 +1,6 @@
 import os
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -31,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.QueryMetricsMiddleware',
+    'backend.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,7 +43,46 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', default='backend.urls')
+
+ASYNC_VIEW_WORKERS = int(os.getenv('ASYNC_VIEW_WORKERS', default=8))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True') == 'True'
+
+METRICS_DUPLICATE_THRESHOLD = int(
+    os.getenv('METRICS_DUPLICATE_THRESHOLD', default=5)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'default': {
+            'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'default',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.getenv('LOG_LEVEL', default='WARNING'),
+    },
+    'loggers': {
+        # Ответы 4xx — обычная работа API, в журнал попадают только 5xx.
+        'django.request': {
+            'level': 'ERROR',
+        },
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('METRICS_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
 
 TEMPLATES = [
     {
@@ -62,15 +104,63 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
+        'ENGINE': os.getenv('DB_ENGINE', default='backend.db.postgresql'),
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', default='True') == 'True',
+        'POOL_MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', default=0)),
+        'POOL_TIMEOUT': int(os.getenv('DB_POOL_TIMEOUT', default=10)),
     }
 }
 
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', default=DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Локальный кэш у каждого процесса свой: изменения, сделанные в другом
+# процессе (воркере gunicorn, manage.py), в нём не видны.
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Без общего кэша версии моделей устаревают через ограниченное время,
+# иначе изменение из другого процесса не дойдёт до процесса до перезапуска.
+MODEL_VERSION_TIMEOUT = None if CACHE_IS_SHARED else int(
+    os.getenv('MODEL_VERSION_TIMEOUT', default=60)
+)
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=3600))
+
+# Сброс фрагмента в локальном кэше не виден другим процессам.
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(os.getenv(
+    'RECIPE_FRAGMENT_CACHE_TIMEOUT',
+    default=3600 if CACHE_IS_SHARED else MODEL_VERSION_TIMEOUT,
+))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -92,7 +182,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -100,6 +190,24 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = 'users.User'
 
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=300)
+)
+
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=20))
+
+INGREDIENT_CATALOG_CACHE = os.getenv(
+    'INGREDIENT_CATALOG_CACHE', default=str(CACHE_IS_SHARED)
+) == 'True'
+if INGREDIENT_CATALOG_CACHE and not CACHE_IS_SHARED:
+    raise ImproperlyConfigured(
+        'INGREDIENT_CATALOG_CACHE требует общего CACHE_BACKEND'
+    )
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', default=7))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 LANGUAGE_CODE = 'ru-Ru'
@@ -115,5 +223,20 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+IMAGE_PIPELINE_SYNC = os.getenv('IMAGE_PIPELINE_SYNC', default='False') == 'True'
+
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', default=2))
+
+RECIPE_THUMBNAIL_SIZE = (
+    int(os.getenv('RECIPE_THUMBNAIL_WIDTH', default=480)),
+    int(os.getenv('RECIPE_THUMBNAIL_HEIGHT', default=480)),
+)
+
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=5 * 1024 * 1024)
+)
+
+RECIPE_IMAGE_QUALITY = int(os.getenv('RECIPE_IMAGE_QUALITY', default=80))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
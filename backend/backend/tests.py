@@ -0,0 +1,131 @@
+import threading
+from unittest import mock, skipUnless
+
+import psycopg2
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+from django.urls import resolve
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from rest_framework.response import Response
+
+from .async_views import async_view
+from .db.postgresql.base import BlockingConnectionPool, DatabaseWrapper
+
+
+def fake_connection(*args, **kwargs):
+    info = mock.Mock(transaction_status=TRANSACTION_STATUS_IDLE)
+    return mock.Mock(closed=False, info=info)
+
+
+class BlockingConnectionPoolTest(SimpleTestCase):
+
+    def test_connections_are_kept_and_reused(self):
+        with mock.patch('psycopg2.connect', side_effect=fake_connection) as (
+            connect
+        ):
+            pool = BlockingConnectionPool(2, 0.1, dbname='foodgram')
+            first = pool.getconn()
+            self.assertTrue(pool.is_fresh(first))
+            pool.putconn(first)
+            again = pool.getconn()
+            self.assertIs(again, first)
+            self.assertFalse(pool.is_fresh(again))
+            pool.getconn()
+            with self.assertRaises(psycopg2.OperationalError):
+                pool.getconn()
+        self.assertEqual(connect.call_count, 2)
+        first.close.assert_not_called()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Нужен PostgreSQL')
+class PostgresHealthCheckTest(TransactionTestCase):
+    """Новые и переиспользуемые соединения backend.db.postgresql."""
+
+    def make_wrapper(self, **options):
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict, 'CONN_HEALTH_CHECKS': True,
+             **options},
+            alias='health-check',
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def select_one(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_opened_and_reused(self):
+        wrapper = self.make_wrapper(CONN_MAX_AGE=60)
+        self.assertEqual(self.select_one(wrapper), 1)
+        raw = wrapper.connection
+        # Конец запроса: соединение остаётся и проверяется при следующем.
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertEqual(self.select_one(wrapper), 1)
+        self.assertIs(wrapper.connection, raw)
+        raw.close()
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertEqual(self.select_one(wrapper), 1)
+        self.assertIsNot(wrapper.connection, raw)
+
+    def test_pooled_connection_is_reused(self):
+        wrapper = self.make_wrapper(CONN_MAX_AGE=0, POOL_MAX_SIZE=2)
+        self.assertEqual(self.select_one(wrapper), 1)
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertEqual(self.select_one(wrapper), 1)
+        self.assertIs(wrapper.connection, raw)
+        self.assertTrue(wrapper.get_autocommit())
+
+
+class AsgiUrlsTest(SimpleTestCase):
+
+    def test_recipe_routes(self):
+        match = resolve(
+            '/api/recipes/download_shopping_cart/',
+            urlconf='backend.asgi_urls',
+        )
+        self.assertEqual(
+            match.func.actions, {'get': 'download_shopping_cart'}
+        )
+        match = resolve('/api/recipes/12/', urlconf='backend.asgi_urls')
+        self.assertEqual(match.kwargs, {'pk': '12'})
+        self.assertEqual(match.func.actions['get'], 'retrieve')
+
+
+class AsyncViewTest(SimpleTestCase):
+
+    def call(self, view):
+        request = RequestFactory().get('/')
+        return async_to_sync(async_view(view))(request)
+
+    def test_cookies_are_kept(self):
+        def view(request):
+            response = Response({'ok': True})
+            response.accepted_renderer = mock.Mock(
+                render=mock.Mock(return_value=b'{}')
+            )
+            response.accepted_media_type = 'application/json'
+            response.renderer_context = {}
+            response.set_cookie('sessionid', 'abc')
+            return response
+
+        response = self.call(view)
+        self.assertEqual(response.cookies['sessionid'].value, 'abc')
+
+    def test_streaming_content_is_read_in_worker(self):
+        threads = []
+
+        def rows():
+            threads.append(threading.current_thread().name)
+            yield b'row'
+
+        def view(request):
+            return StreamingHttpResponse(rows())
+
+        response = self.call(view)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('async-view'))
+        self.assertEqual(b''.join(response), b'row')
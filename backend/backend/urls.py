@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .views import metrics_view
+
 api_patterns = [
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('users.urls')),
     path('', include('recipes.urls')),
 ]
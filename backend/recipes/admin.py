@@ -39,7 +39,7 @@ class RecipeAdmin(admin.ModelAdmin):
     @staticmethod
     @admin.display(description=_('Количество добавлений в избранное'))
     def in_favorites(obj):
-        return obj.favorites.all().count()
+        return obj.favorites_count
 
 
 class IdUserAdmin(admin.ModelAdmin):
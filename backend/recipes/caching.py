@@ -0,0 +1,99 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Ingredient, Tag
+from backend.routers import read_from_primary
+
+MODEL_VERSION_KEY = 'model-version:{}'
+RECIPE_FRAGMENT_KEY = 'recipe-fragment:{}:{}:{}'
+
+
+def get_model_version(model):
+    """
+    Возвращает версию данных модели — время последнего изменения.
+    Если ключ вытеснен из кэша или устарел по MODEL_VERSION_TIMEOUT,
+    создаётся новая версия, поэтому зависящие от неё снимки
+    и ответы просто пересоберутся.
+    """
+    key = MODEL_VERSION_KEY.format(model._meta.label_lower)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), settings.MODEL_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_model_version(model):
+    cache.set(
+        MODEL_VERSION_KEY.format(model._meta.label_lower), time.time(),
+        settings.MODEL_VERSION_TIMEOUT,
+    )
+
+
+def get_tag_slugs():
+    """Возвращает словарь slug → id тегов, кэшированный по версии Tag."""
+    key = f'tag-slugs:{get_model_version(Tag)}'
+    slugs = cache.get(key)
+    if slugs is None:
+        with read_from_primary():
+            slugs = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, slugs, None)
+    return slugs
+
+
+def recipe_fragment_keys(recipe_ids):
+    """
+    Ключи фрагментов рецептов. В ключ входят версии тегов и ингредиентов,
+    поэтому их изменение сразу делает устаревшими все фрагменты.
+    """
+    tags = get_model_version(Tag)
+    ingredients = get_model_version(Ingredient)
+    return {
+        recipe_id: RECIPE_FRAGMENT_KEY.format(
+            recipe_id, tags, ingredients
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+def get_recipe_fragments(recipes, build):
+    """
+    Возвращает словарь id → не зависящая от пользователя часть рецепта.
+    Отсутствующие в кэше фрагменты собираются одним вызовом build.
+    """
+    keys = recipe_fragment_keys({recipe.pk for recipe in recipes})
+    cached = cache.get_many(keys.values())
+    fragments = {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items() if key in cached
+    }
+    missing = [recipe for recipe in recipes if recipe.pk not in fragments]
+    if missing:
+        built = build(missing)
+        fragments.update(built)
+        cache.set_many(
+            {keys[recipe_id]: built[recipe_id] for recipe_id in built},
+            settings.RECIPE_FRAGMENT_CACHE_TIMEOUT,
+        )
+    return fragments
+
+
+def forget_recipe_fragments(recipe_ids):
+    """
+    Удаляет фрагменты рецептов сразу и ещё раз после фиксации транзакции,
+    чтобы не остался фрагмент, собранный параллельным запросом
+    по данным до изменения.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    cache.delete_many(recipe_fragment_keys(recipe_ids).values())
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(
+            lambda: cache.delete_many(
+                recipe_fragment_keys(recipe_ids).values()
+            )
+        )
@@ -0,0 +1,62 @@
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from .caching import get_model_version
+from .models import Ingredient
+from backend.routers import read_from_primary
+
+CatalogItem = namedtuple('CatalogItem', ('id', 'name', 'measurement_unit'))
+
+
+class IngredientCatalog:
+    """Неизменяемый снимок каталога, отсортированный по названию."""
+
+    def __init__(self, items, version):
+        entries = sorted(
+            (item.name.lower(), item.measurement_unit, item) for item in items
+        )
+        self.keys = tuple(key for key, _, _ in entries)
+        self.items = tuple(item for _, _, item in entries)
+        self.version = version
+
+    def search(self, term, limit):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        term = term.lower()
+        found = []
+        position = bisect_left(self.keys, term)
+        while (position < len(self.keys) and len(found) < limit
+               and self.keys[position].startswith(term)):
+            found.append(self.items[position])
+            position += 1
+        if len(found) < limit and term:
+            for key, item in zip(self.keys, self.items):
+                if term in key and not key.startswith(term):
+                    found.append(item)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+_catalog = None
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """Возвращает снимок каталога, пересобирая его при смене версии."""
+    global _catalog
+    version = get_model_version(Ingredient)
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _lock:
+            catalog = _catalog
+            if catalog is None or catalog.version != version:
+                with read_from_primary():
+                    items = [
+                        CatalogItem(*row)
+                        for row in Ingredient.objects.values_list(
+                            'id', 'name', 'measurement_unit'
+                        )
+                    ]
+                catalog = _catalog = IngredientCatalog(items, version)
+    return catalog
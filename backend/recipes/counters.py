@@ -0,0 +1,65 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик через F(), не опуская его ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(model, field, **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}, **filters
+        ).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def recount_counters(apps=None):
+    """
+    Пересчитывает денормализованные счётчики рецептов и пользователей.
+    В миграциях передаётся реестр исторических моделей apps.
+    """
+    if apps is None:
+        from django.apps import apps
+    get_model = apps.get_model
+    Recipe = get_model('recipes', 'Recipe')
+    User = get_model('users', 'User')
+    recipes = Recipe.objects.update(
+        favorites_count=count_subquery(get_model('recipes', 'Favorite'),
+                                       'recipe'),
+        carts_count=count_subquery(get_model('recipes', 'ShoppingCart'),
+                                   'recipe'),
+    )
+    users = User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(get_model('users', 'Follow'),
+                                       'author'),
+    )
+    return recipes, users
+
+
+def refresh_trending_scores(since, batch_size=500):
+    """
+    Пересчитывает trending_score — число добавлений в избранное начиная
+    с since. Обновляются только рецепты, попавшие в окно, и рецепты
+    с ненулевым прошлым счётом, которые могли из него выпасть.
+    """
+    from .models import Favorite, Recipe
+
+    recipe_ids = set(Favorite.objects.filter(
+        created__gte=since).values_list('recipe_id', flat=True))
+    recipe_ids.update(Recipe.objects.filter(
+        trending_score__gt=0).values_list('id', flat=True))
+    recipe_ids = sorted(recipe_ids)
+    score = count_subquery(Favorite, 'recipe', created__gte=since)
+    for start in range(0, len(recipe_ids), batch_size):
+        Recipe.objects.filter(
+            id__in=recipe_ids[start:start + batch_size]
+        ).update(trending_score=score)
+    return len(recipe_ids)
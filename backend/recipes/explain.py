@@ -0,0 +1,45 @@
+import re
+
+from django.db import connection
+
+SEQ_SCAN_RE = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$'),
+}
+# Справочники, которые читаются целиком намеренно.
+FULL_SCAN_ALLOWED = {'recipes_tag', 'recipes_ingredient'}
+
+
+def seq_scan_tables(queries):
+    """
+    Таблицы, которые планировщик читает целиком, по EXPLAIN запросов
+    из CaptureQueriesContext. В PostgreSQL последовательное сканирование
+    запрещается, чтобы на небольших данных проявился отсутствующий
+    индекс. В SQLite обход таблицы по rowid с LIMIT без временного
+    B-дерева для сортировки — это чтение по первичному ключу,
+    а не полный просмотр.
+    """
+    pattern = SEQ_SCAN_RE.get(connection.vendor)
+    if pattern is None:
+        return []
+    prefix = connection.ops.explain_query_prefix()
+    known_tables = set(connection.introspection.table_names())
+    tables = set()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+        for sql in {query['sql'] for query in queries}:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute(f'{prefix} {sql}')
+            plan = [str(row[-1]).strip() for row in cursor.fetchall()]
+            if (connection.vendor == 'sqlite' and ' LIMIT ' in sql
+                    and not any('TEMP B-TREE' in line for line in plan)):
+                continue
+            for line in plan:
+                match = pattern.search(line)
+                if match and match.group(1) in known_tables:
+                    tables.add(match.group(1))
+        if connection.vendor == 'postgresql':
+            cursor.execute('RESET enable_seqscan')
+    return sorted(tables)
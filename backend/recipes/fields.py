@@ -0,0 +1,67 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+def find_duplicates(values):
+    seen = set()
+    duplicates = set()
+    for value in values:
+        if value in seen:
+            duplicates.add(value)
+        seen.add(value)
+    return duplicates
+
+
+def resolve_pks(queryset, pks):
+    """
+    Загружает объекты по списку первичных ключей одним запросом id__in.
+    Возвращает объекты в порядке pks и множество ненайденных ключей.
+    """
+    objects = queryset.in_bulk(pks)
+    missing = {pk for pk in pks if pk not in objects}
+    return [objects[pk] for pk in pks if pk in objects], missing
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Проверяет список первичных ключей одним запросом к базе."""
+    default_error_messages = {
+        'does_not_exist': _('Объекты не найдены: {pk_values}.'),
+        'duplicates': _('Значения должны быть уникальными: {pk_values}.'),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        pks = [self.child_relation.to_pk(item) for item in data]
+        duplicates = find_duplicates(pks)
+        if duplicates:
+            self.fail('duplicates', pk_values=sorted(duplicates))
+        objects, missing = resolve_pks(
+            self.child_relation.get_queryset(), pks
+        )
+        if missing:
+            self.fail('does_not_exist', pk_values=sorted(missing))
+        return objects
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который при many=True проверяет ключи разом."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
@@ -1,15 +1,66 @@
+from django.conf import settings
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
+from django.db.models.functions import Lower
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
+from .caching import get_tag_slugs
 from .models import Recipe
+from .search import search_recipes
 
 
-class IngredientSearchFilter(SearchFilter):
+class IngredientSearchFilter(BaseFilterBackend):
+    """
+    Автодополнение ингредиентов: сначала совпадения по началу названия,
+    затем по подстроке. Выдача списка ограничена INGREDIENT_SEARCH_LIMIT.
+    """
     search_param = 'name'
 
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').strip().lower()
+
+    def filter_queryset(self, request, queryset, view):
+        if view.action != 'list':
+            return queryset
+        name = self.get_search_term(request)
+        queryset = queryset.annotate(lower_name=Lower('name'))
+        if not name:
+            return queryset.order_by('lower_name', 'measurement_unit')[
+                :settings.INGREDIENT_SEARCH_LIMIT
+            ]
+        queryset = queryset.filter(lower_name__contains=name).annotate(
+            rank=Case(
+                When(lower_name__startswith=name, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('rank', 'lower_name', 'measurement_unit')
+        return queryset[:settings.INGREDIENT_SEARCH_LIMIT]
+
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_slugs()]
+
 
 class RecipeFilter(FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    search = filters.CharFilter(method='filter_search')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags',
+    )
+    ordering = filters.ChoiceFilter(
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'Популярные за неделю'),
+        ),
+        method='filter_ordering',
+    )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
@@ -17,7 +68,24 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('search', 'tags', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'ordering')
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        slugs = get_tag_slugs()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[slugs[slug] for slug in value],
+        )))
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
 
     def filter_is_favorited(self, queryset, name, value):
         if value:
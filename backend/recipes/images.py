@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .caching import forget_recipe_fragments
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'recipe/thumbnails/'
+WEBP_DIR = 'recipe/webp/'
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                    thread_name_prefix='recipe-images',
+                )
+    return _executor
+
+
+def variant_names(image_name):
+    # Имя фото уникально в хранилище, а основа имени — нет: photo.png
+    # и photo.jpg разных рецептов различаются только хешем полного имени.
+    stem = os.path.splitext(os.path.basename(image_name))[0][:40]
+    digest = hashlib.sha1(image_name.encode()).hexdigest()[:12]
+    name = f'{stem}-{digest}'
+    return f'{THUMBNAIL_DIR}{name}.jpg', f'{WEBP_DIR}{name}.webp'
+
+
+def needs_processing(recipe):
+    if not recipe.image:
+        return False
+    thumbnail_name, _ = variant_names(recipe.image.name)
+    # Хранилище добавляет к занятому имени суффикс _XXXXXXX.
+    root = re.escape(os.path.splitext(thumbnail_name)[0])
+    return not re.fullmatch(
+        rf'{root}(_[a-zA-Z0-9]{{7}})?\.jpg', recipe.image_thumbnail.name
+    )
+
+
+def encode(image, image_format, **options):
+    # Пересохранение без exif/icc удаляет метаданные исходного файла.
+    buffer = BytesIO()
+    image.save(buffer, image_format, optimize=True, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Создаёт уменьшенную копию и WebP-вариант фото рецепта."""
+    try:
+        with default_storage.open(image_name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image = image.convert('RGB')
+        image.thumbnail(settings.RECIPE_THUMBNAIL_SIZE)
+        thumbnail_name, webp_name = variant_names(image_name)
+        # Занятые имена не удаляем: save() подберёт свободное.
+        thumbnail_name = default_storage.save(
+            thumbnail_name,
+            encode(image, 'JPEG', quality=settings.RECIPE_IMAGE_QUALITY),
+        )
+        webp_name = default_storage.save(
+            webp_name,
+            encode(image, 'WEBP', quality=settings.RECIPE_IMAGE_QUALITY),
+        )
+        updated = Recipe.objects.filter(
+            pk=recipe_id, image=image_name
+        ).update(image_thumbnail=thumbnail_name, image_webp=webp_name)
+        if not updated:
+            default_storage.delete(thumbnail_name)
+            default_storage.delete(webp_name)
+            return
+        # update() не отправляет post_save, поэтому фрагмент рецепта
+        # с пустыми ссылками на варианты сбрасываем явно.
+        forget_recipe_fragments([recipe_id])
+    except Exception:
+        logger.exception('Не удалось обработать фото рецепта %s', recipe_id)
+    finally:
+        if threading.current_thread().name.startswith('recipe-images'):
+            connection.close()
+
+
+def schedule_image_processing(recipe):
+    """Ставит обработку фото в пул потоков после фиксации транзакции."""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    # SQLite блокирует базу целиком: запись из фонового потока
+    # конкурирует с транзакциями запросов, поэтому обрабатываем сразу.
+    if settings.IMAGE_PIPELINE_SYNC or connection.vendor == 'sqlite':
+        transaction.on_commit(
+            lambda: process_recipe_image(recipe_id, image_name)
+        )
+    else:
+        transaction.on_commit(lambda: get_executor().submit(
+            process_recipe_image, recipe_id, image_name
+        ))
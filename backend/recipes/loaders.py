@@ -0,0 +1,112 @@
+import csv
+import json
+from itertools import islice
+
+from .caching import bump_model_version
+from .models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+MAX_ITEM_SIZE = 1024 * 1024
+
+
+def read_csv_ingredients(stream):
+    """Построчно читает пары «название, единица измерения» из CSV."""
+    for row in csv.reader(stream):
+        if len(row) >= 2 and row[0].strip():
+            yield row[0].strip(), row[1].strip()
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+    return position
+
+
+def check_json_end(decoder, tail, opened):
+    """Разбор дошёл до конца файла, не встретив закрывающей скобки."""
+    if not opened:
+        raise ValueError('Ожидается JSON-массив объектов')
+    if tail.strip():
+        # Повторный разбор даёт JSONDecodeError с позицией ошибки.
+        decoder.raw_decode(tail.lstrip())
+    raise ValueError('JSON-массив не закрыт: файл обрезан')
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE,
+                    max_item_size=MAX_ITEM_SIZE):
+    """
+    Потоково разбирает JSON-массив объектов, не загружая файл целиком.
+    Обрезанный или повреждённый файл вызывает ValueError.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    opened = False
+    for chunk in iter(lambda: stream.read(chunk_size), ''):
+        buffer = buffer[position:] + chunk
+        position = skip_separators(buffer, 0)
+        while position < len(buffer):
+            if not opened:
+                if buffer[position] != '[':
+                    raise ValueError('Ожидается JSON-массив объектов')
+                opened = True
+                position = skip_separators(buffer, position + 1)
+                continue
+            if buffer[position] == ']':
+                if (buffer[position + 1:] + stream.read()).strip():
+                    raise ValueError('Лишние данные после JSON-массива')
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Объект может продолжаться в следующем фрагменте.
+                if len(buffer) - position > max_item_size:
+                    raise ValueError(
+                        f'Элемент JSON-массива длиннее {max_item_size} '
+                        'символов'
+                    )
+                break
+            yield item
+            position = skip_separators(buffer, position)
+    check_json_end(decoder, buffer[position:], opened)
+
+
+def read_json_ingredients(stream):
+    """Читает ингредиенты из JSON-фикстуры или массива плоских объектов."""
+    for number, item in enumerate(iter_json_array(stream), 1):
+        fields = item.get('fields', item) if isinstance(item, dict) else None
+        if not isinstance(fields, dict):
+            raise ValueError(f'Элемент {number}: ожидается объект')
+        name, unit = fields['name'], fields['measurement_unit']
+        if not isinstance(name, str) or not isinstance(unit, str):
+            raise ValueError(
+                f'Элемент {number}: название и единица измерения '
+                'должны быть строками'
+            )
+        yield name.strip(), unit.strip()
+
+
+READERS = {
+    'csv': read_csv_ingredients,
+    'json': read_json_ingredients,
+}
+
+
+def load_ingredients(rows, batch_size=1000):
+    """
+    Пакетно сохраняет ингредиенты, пропуская уже существующие
+    по ограничению name_unit_uniq. Возвращает число прочитанных строк.
+    """
+    rows = iter(rows)
+    processed = 0
+    while True:
+        batch = [
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in islice(rows, batch_size)
+        ]
+        if not batch:
+            break
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        processed += len(batch)
+    bump_model_version(Ingredient)
+    return processed
@@ -0,0 +1,345 @@
+import base64
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment,
+    teardown_test_environment,
+)
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.counters import recount_counters
+from recipes.explain import FULL_SCAN_ALLOWED, seq_scan_tables
+from recipes.loaders import load_ingredients, read_csv_ingredients
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+)
+from users.models import Follow, User
+
+PASSWORD = 'Bench-password-123'
+METHODS_ORDER = ('get', 'post', 'patch', 'put', 'delete')
+PATH_RE = re.compile(r'^  (/\S*):\s*$')
+METHOD_RE = re.compile(r'^    (get|post|put|patch|delete):\s*$')
+
+
+def read_schema_paths(schema_path):
+    """Возвращает пары (метод, путь) из openapi-схемы без разбора YAML."""
+    endpoints = []
+    current_path = None
+    with open(schema_path, encoding='utf-8') as schema:
+        for line in schema:
+            if line.strip() and not line.startswith(' '):
+                if line.startswith('components:'):
+                    break
+                continue
+            path_match = PATH_RE.match(line)
+            if path_match:
+                current_path = path_match.group(1)
+                continue
+            method_match = METHOD_RE.match(line)
+            if method_match and current_path:
+                endpoints.append((method_match.group(1), current_path))
+    return sorted(
+        endpoints,
+        key=lambda item: (item[1], METHODS_ORDER.index(item[0]))
+    )
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def tiny_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех эндпоинтов из docs/openapi-schema.yml '
+        'на синтетических данных во временной тестовой базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--schema',
+            default=os.path.join(
+                settings.BASE_DIR, os.pardir, 'docs', 'openapi-schema.yml'
+            ),
+        )
+        parser.add_argument(
+            '--ingredients-csv',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Проверить планы запросов на последовательное сканирование',
+        )
+        parser.add_argument(
+            '--json', dest='json_path',
+            help='Сохранить результаты в JSON-файл',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        endpoints = read_schema_paths(options['schema'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        # Загруженные фото живут столько же, сколько тестовая база.
+        # Варианты фото строятся сразу: фоновый поток писал бы
+        # в уже удалённый каталог.
+        media_root = tempfile.mkdtemp(prefix='benchmark-media-')
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root, IMAGE_PIPELINE_SYNC=True
+            ):
+                self.seed()
+                results = [self.measure(method, path)
+                           for method, path in endpoints]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+        self.report(results)
+        if options['explain']:
+            failed = [
+                f'{row["method"]} {row["path"]}: {", ".join(row["seq_scans"])}'
+                for row in results
+                if set(row['seq_scans']) - FULL_SCAN_ALLOWED
+            ]
+            if failed:
+                raise CommandError(
+                    'Последовательное сканирование таблиц:\n'
+                    + '\n'.join(failed)
+                )
+
+    def seed(self):
+        options = self.options
+        started = time.perf_counter()
+        total = options['warmup'] + options['repeat'] + 1
+        with open(options['ingredients_csv'], encoding='utf-8') as source:
+            load_ingredients(read_csv_ingredients(source))
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        Tag.objects.bulk_create(
+            Tag(name=f'tag{i}', slug=f'tag{i}', color=f'#0000{i:02d}')
+            for i in range(8)
+        )
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@example.org',
+                 first_name='Имя', last_name='Фамилия', password=password)
+            for i in range(options['users'] + total)
+        )
+        users = list(User.objects.order_by('id'))
+        self.user = users[0]
+        self.authors = users[1:options['users']]
+        self.spare_authors = users[options['users']:]
+        self.token = Token.objects.create(user=self.user)
+
+        authors = users[:options['users']]
+        Recipe.objects.bulk_create(
+            Recipe(name=f'recipe{i}', author=self.random.choice(authors),
+                   text='Описание', image='recipe/bench.png',
+                   cooking_time=self.random.randint(1, 120))
+            for i in range(options['recipes'])
+        )
+        Recipe.objects.bulk_create(
+            Recipe(name=f'own{i}', author=self.user, text='Описание',
+                   image='recipe/bench.png', cooking_time=10)
+            for i in range(total)
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            name__startswith='recipe').values_list('id', flat=True))
+        self.own_ids = list(Recipe.objects.filter(
+            name__startswith='own').values_list('id', flat=True))
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids + self.own_ids
+            for tag_id in self.random.sample(self.tag_ids, 2)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                             amount=self.random.randint(1, 500))
+            for recipe_id in recipe_ids + self.own_ids
+            for ingredient_id in self.random.sample(
+                self.ingredient_ids, options['ingredients_per_recipe'])
+        )
+
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author)
+            for user in authors
+            for author in self.random.sample(self.authors, options['follows'])
+            if author != user
+        )
+        for model, per_user in ((Favorite, options['favorites']),
+                                (ShoppingCart, options['carts'])):
+            model.objects.bulk_create(
+                model(user=user, recipe_id=recipe_id)
+                for user in authors
+                for recipe_id in self.random.sample(recipe_ids, per_user)
+            )
+        recount_counters()
+        taken = set(Favorite.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        taken |= set(ShoppingCart.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        self.free_ids = [pk for pk in recipe_ids if pk not in taken][:total]
+        self.recipe_id = recipe_ids[0]
+        self.stdout.write(
+            f'Данные подготовлены за {time.perf_counter() - started:.1f} с: '
+            f'{len(users)} пользователей, {len(recipe_ids)} рецептов, '
+            f'{len(self.ingredient_ids)} ингредиентов'
+        )
+
+    def client(self, token=None):
+        client = APIClient()
+        token = token or self.token
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def recipe_data(self, name):
+        return {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': tiny_image(),
+            'tags': self.tag_ids[:2],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in self.ingredient_ids[:5]
+            ],
+        }
+
+    def build_request(self, method, path, i):
+        """Возвращает (клиент, url, тело) для i-й итерации эндпоинта."""
+        limit = self.options['limit']
+        client = self.client()
+        ids = {
+            '/api/tags/{id}/': self.tag_ids[0],
+            '/api/ingredients/{id}/': self.ingredient_ids[0],
+            '/api/users/{id}/': self.authors[0].id,
+            '/api/recipes/{id}/': (
+                self.recipe_id if method == 'get' else self.own_ids[i]
+            ),
+            '/api/recipes/{id}/favorite/': self.free_ids[i],
+            '/api/recipes/{id}/shopping_cart/': self.free_ids[i],
+            '/api/users/{id}/subscribe/': self.spare_authors[i].id,
+        }
+        url = path.replace('{id}', str(ids.get(path, '')))
+        data = None
+        if method == 'get':
+            query = {
+                '/api/recipes/': f'?limit={limit}',
+                '/api/users/': f'?limit={limit}',
+                '/api/users/subscriptions/': f'?limit={limit}&recipes_limit=3',
+                '/api/ingredients/': '?name=' + 'сол',
+            }
+            url += query.get(path, '')
+        elif path == '/api/users/':
+            data = {
+                'email': f'new{method}{i}@example.org',
+                'username': f'new{method}{i}', 'first_name': 'Имя',
+                'last_name': 'Фамилия', 'password': PASSWORD,
+            }
+        elif path == '/api/recipes/':
+            data = self.recipe_data(f'bench{i}')
+        elif path == '/api/recipes/{id}/' and method == 'patch':
+            data = self.recipe_data(f'patched{i}')
+        elif path == '/api/users/set_password/':
+            data = {'current_password': PASSWORD, 'new_password': PASSWORD}
+        elif path == '/api/auth/token/login/':
+            client = APIClient()
+            data = {'email': self.user.email, 'password': PASSWORD}
+        elif path == '/api/auth/token/logout/':
+            user = self.spare_authors[i]
+            client = self.client(Token.objects.get_or_create(user=user)[0])
+        return client, url, data
+
+    def call(self, method, path, i):
+        client, url, data = self.build_request(method, path, i)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data, format='json')
+            elapsed = time.perf_counter() - started
+        return response, elapsed, queries.captured_queries
+
+    def measure(self, method, path):
+        options = self.options
+        for i in range(options['warmup']):
+            self.call(method, path, i)
+        timings = []
+        query_counts = []
+        statuses = set()
+        offset = options['warmup']
+        for i in range(offset, offset + options['repeat']):
+            response, elapsed, queries = self.call(method, path, i)
+            timings.append(elapsed * 1000)
+            query_counts.append(len(queries))
+            statuses.add(response.status_code)
+        tracemalloc.start()
+        _, _, queries = self.call(method, path, offset + options['repeat'])
+        allocated, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        seq_scans = seq_scan_tables(queries) if options['explain'] else []
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': sorted(statuses),
+            'queries': max(query_counts),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'alloc_kib': round(allocated / 1024, 1),
+            'peak_kib': round(peak / 1024, 1),
+            'seq_scans': seq_scans,
+        }
+
+    def report(self, results):
+        header = (f'{"method":<7}{"path":<40}{"status":<10}{"queries":>8}'
+                  f'{"p50 ms":>10}{"p95 ms":>10}{"peak KiB":>11}')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in results:
+            status = ','.join(str(code) for code in row['status'])
+            self.stdout.write(
+                f'{row["method"]:<7}{row["path"]:<40}{status:<10}'
+                f'{row["queries"]:>8}{row["p50_ms"]:>10}{row["p95_ms"]:>10}'
+                f'{row["peak_kib"]:>11}  {" ".join(row["seq_scans"])}'
+            )
+        if self.options['json_path']:
+            with open(self.options['json_path'], 'w') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
@@ -0,0 +1,121 @@
+import copy
+import os
+import tempfile
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment
+)
+
+from .benchmark_api import percentile
+from recipes.models import Tag
+
+PATH = '/api/tags/'
+
+MODES = (
+    ('без переиспользования', {'CONN_MAX_AGE': 0}),
+    ('CONN_MAX_AGE', {'CONN_MAX_AGE': 600}),
+    ('CONN_MAX_AGE + проверка',
+     {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}),
+    ('пул', {'CONN_MAX_AGE': 0, 'POOL_MAX_SIZE': 4}),
+)
+# Проверка соединений и пул есть только в backend.db.postgresql.
+CUSTOM_BACKEND_KEYS = {'CONN_HEALTH_CHECKS', 'POOL_MAX_SIZE'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа списка тегов при новом соединении '
+        'с базой на каждый запрос, CONN_MAX_AGE и пуле соединений'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.handler = WSGIHandler()
+        self.environ = RequestFactory().get(PATH).environ
+        self.connects = 0
+        connection_created.connect(self.count_connect)
+        original = copy.deepcopy(connection.settings_dict)
+        if connection.vendor == 'sqlite':
+            # Базу в памяти Django не закрывает, нужен файл.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.gettempdir(), 'benchmark_connections.sqlite3'
+            )
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            Tag.objects.bulk_create(
+                Tag(name=f'tag{i}', slug=f'tag{i}', color=f'#0000{i:02d}')
+                for i in range(8)
+            )
+            test_settings = dict(connection.settings_dict)
+            results = []
+            # Ответ без кэша, чтобы каждый запрос обращался к базе.
+            with override_settings(RESPONSE_CACHE_TIMEOUT=0):
+                for name, mode in MODES:
+                    if set(mode) & CUSTOM_BACKEND_KEYS and not hasattr(
+                        connection, 'health_check_done'
+                    ):
+                        continue
+                    connection.close()
+                    connection.settings_dict.update({
+                        **test_settings,
+                        'CONN_HEALTH_CHECKS': False,
+                        'POOL_MAX_SIZE': 0,
+                        **mode,
+                    })
+                    results.append((name, *self.measure()))
+            connection.close()
+            connection.settings_dict.update(test_settings)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            connection.settings_dict.clear()
+            connection.settings_dict.update(original)
+            teardown_test_environment()
+            connection_created.disconnect(self.count_connect)
+        self.report(results)
+
+    def count_connect(self, sender, connection, **kwargs):
+        self.connects += 1
+
+    def call(self):
+        started = time.perf_counter()
+        response = self.handler(dict(self.environ), lambda *args: None)
+        response.close()
+        return time.perf_counter() - started
+
+    def measure(self):
+        for _ in range(self.options['warmup']):
+            self.call()
+        self.connects = 0
+        timings = [self.call() * 1000 for _ in range(self.options['requests'])]
+        return (
+            self.connects,
+            percentile(timings, 50),
+            percentile(timings, 95),
+        )
+
+    def report(self, results):
+        header = (f'{"режим":<26}{"соединений":>12}'
+                  f'{"p50 ms":>10}{"p95 ms":>10}{"экономия p50":>15}')
+        self.stdout.write(f'{connection.vendor}: GET {PATH}, '
+                          f'{self.options["requests"]} запросов')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        baseline = results[0][2]
+        for name, connects, p50, p95 in results:
+            self.stdout.write(
+                f'{name:<26}{connects:>12}{p50:>10.2f}{p95:>10.2f}'
+                f'{baseline - p50:>12.2f} ms'
+            )
@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.loaders import READERS, load_ingredients
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает каталог ингредиентов из CSV или JSON. '
+        'Существующие записи пропускаются, повторный запуск безопасен'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+        )
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        )
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {path}. Укажите --format'
+            )
+        before = Ingredient.objects.count()
+        started = time.perf_counter()
+        try:
+            # Обрезанный или битый файл не должен загрузиться частично.
+            with open(path, encoding='utf-8', newline='') as source, \
+                    transaction.atomic():
+                processed = load_ingredients(
+                    READERS[file_format](source), options['batch_size']
+                )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Не удалось загрузить {path}: {error}')
+        elapsed = time.perf_counter() - started
+        created = Ingredient.objects.count() - before
+        rate = processed / elapsed if elapsed else processed
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {processed} строк, добавлено {created} '
+            f'за {elapsed:.2f} с ({rate:.0f} строк/с)'
+        ))
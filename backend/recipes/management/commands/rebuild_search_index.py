@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.search import create_search_index, refresh_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс рецептов'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            create_search_index()
+            refresh_search_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран'))
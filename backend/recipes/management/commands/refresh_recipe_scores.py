@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.counters import refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет рейтинг рецептов для сортировки ordering=trending. '
+        'Запускается периодически, например из cron'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-days', type=int, default=settings.TRENDING_WINDOW_DAYS
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['window_days'])
+        updated = refresh_trending_scores(since, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлён рейтинг {updated} рецептов'
+        ))
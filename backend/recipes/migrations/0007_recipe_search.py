@@ -0,0 +1,33 @@
+# Generated by Django 3.2.14 on 2026-10-18 19:32
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from recipes.search import (
+    create_search_index, drop_search_index, refresh_search_index
+)
+
+
+def build_search_index(apps, schema_editor):
+    create_search_index(schema_editor.connection)
+    refresh_search_index(conn=schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(build_search_index, remove_search_index),
+    ]
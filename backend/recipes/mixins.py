@@ -0,0 +1,59 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .caching import get_model_version
+from backend.routers import read_from_primary
+
+
+class ConditionalCacheMixin:
+    """
+    Отдаёт справочные данные с ETag и Last-Modified по версии модели,
+    отвечает 304 на условные запросы и хранит готовые данные ответа
+    в кэше Django. Смена версии модели делает старые записи недоступными.
+    """
+
+    def get_cache_version(self):
+        return get_model_version(self.queryset.model)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        version = self.get_cache_version()
+        path_hash = md5(request.get_full_path().encode()).hexdigest()
+        etag = quote_etag(
+            f'{self.queryset.model._meta.model_name}-{version}-{path_hash}'
+        )
+        last_modified = int(version)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is None:
+            key = f'response:{etag}'
+            data = cache.get(key)
+            if data is None:
+                with read_from_primary():
+                    response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                data = response.data
+                cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+            response = Response(data)
+        else:
+            response = not_modified
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, max_age=0, must_revalidate=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
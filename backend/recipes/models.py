@@ -1,7 +1,11 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, RowNumber
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
@@ -59,6 +63,9 @@ class Ingredient(models.Model):
                 fields=('name', 'measurement_unit'),
                 name='name_unit_uniq'),
         )
+        indexes = (
+            models.Index(Lower('name'), name='ingredient_lower_name_idx'),
+        )
         ordering = ('name',)
         verbose_name = _('Ингредиент')
         verbose_name_plural = _('Ингредиенты')
@@ -67,6 +74,61 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты для сериализации."""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'amounts',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
+
+    def first_per_author(self, limit):
+        """
+        Оставляет не более limit последних рецептов каждого автора
+        одним запросом с оконной функцией ROW_NUMBER().
+        """
+        ranked = self.annotate(recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=F('id').desc(),
+        )).values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE recipe_rank <= %s',
+            (*params, limit),
+        ))
+
+    def with_user_flags(self, user):
+        """Аннотирует рецепты флагами is_favorited и is_in_shopping_cart."""
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+
+    def get_queryset(self):
+        # Поисковый вектор нужен только СУБД: не читаем его в Python
+        # и не перезаписываем устаревшим значением при save().
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     name = models.CharField(
         verbose_name=_('Название'),
@@ -99,14 +161,58 @@ class Recipe(models.Model):
         upload_to='recipe/',
         help_text=_('Загрузите фото готового блюда'),
     )
+    image_thumbnail = models.ImageField(
+        verbose_name=_('Уменьшенное фото'),
+        upload_to='recipe/thumbnails/',
+        blank=True,
+        editable=False,
+    )
+    image_webp = models.ImageField(
+        verbose_name=_('Фото в формате WebP'),
+        upload_to='recipe/webp/',
+        blank=True,
+        editable=False,
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
     cooking_time = models.PositiveSmallIntegerField(
         validators=(MinValueValidator(1),),
         verbose_name=_('Время приготовления'),
         help_text=_('Укажите время приготовления блюда'),
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name=_('Добавлений в избранное'),
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name=_('Добавлений в корзину'),
+        default=0,
+        editable=False,
+    )
+    trending_score = models.PositiveIntegerField(
+        verbose_name=_('Добавлений в избранное за последние дни'),
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ('-id',)
+        indexes = (
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_idx',
+            ),
+        )
         verbose_name = _('Рецепт')
         verbose_name_plural = _('Рецепты')
 
@@ -145,6 +251,12 @@ class RecipeIngredient(models.Model):
                 check=models.Q(amount__gt=0),
                 name='amount_gt_0'),
         )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'ingredient', 'amount'),
+                name='recipe_amounts_covering_idx',
+            ),
+        )
         verbose_name = _('Ингредиент в рецепте')
         verbose_name_plural = _('Ингредиенты в рецепте')
 
@@ -162,6 +274,11 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name=_('Рецепт'),
     )
+    created = models.DateTimeField(
+        verbose_name=_('Дата добавления'),
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = _('Избранное')
@@ -172,6 +289,12 @@ class Favorite(models.Model):
                 name='unique favorite'
             )
         ]
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favorite_recipe_idx',
+            ),
+        )
 
 
 class ShoppingCart(models.Model):
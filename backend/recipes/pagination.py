@@ -1,5 +1,36 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по сортировке запроса (по умолчанию — Meta.ordering
+    модели): страницы выбираются условием по ключу без OFFSET и COUNT(*).
+    """
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(queryset.query.order_by or queryset.model._meta.ordering)
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    """
+    Постраничная пагинация; при наличии параметра cursor (в том числе
+    пустого) переключается на курсорную без подсчёта общего количества.
+    """
     page_size_query_param = 'limit'
+    cursor_pagination_class = CustomCursorPagination
+    cursor_pagination = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param in request.query_params:
+            self.cursor_pagination = self.cursor_pagination_class()
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,93 @@
+import json
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParser as DjangoParser
+from django.http.multipartparser import MultiPartParserError
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, ParseError, UnsupportedMediaType
+)
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',
+    b'\x89PNG\r\n\x1a\n',
+    b'GIF87a',
+    b'GIF89a',
+)
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Размер загружаемого файла превышает допустимый')
+    default_code = 'upload_too_large'
+
+
+def is_image_header(chunk):
+    return chunk.startswith(IMAGE_SIGNATURES) or (
+        chunk[:4] == b'RIFF' and chunk[8:12] == b'WEBP'
+    )
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет фото рецепта во временный файл по частям и прерывает загрузку,
+    как только файл оказывается слишком большим или не изображением.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        limit = (
+            settings.RECIPE_IMAGE_MAX_SIZE
+            + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        )
+        if content_length > limit:
+            raise UploadTooLarge()
+
+    def new_file(self, field_name, file_name, content_type, *args,
+                 **kwargs):
+        if not content_type.startswith('image/'):
+            raise UnsupportedMediaType(content_type)
+        super().new_file(field_name, file_name, content_type, *args,
+                         **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # Временный файл не закрываем: его закроет и удалит сам Django,
+        # повторное закрытие ломает очистку в _TemporaryFileCloser.
+        if start == 0 and not is_image_header(raw_data):
+            raise UnsupportedMediaType(self.content_type)
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise UploadTooLarge()
+        return super().receive_data_chunk(raw_data, start)
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """
+    multipart/form-data для рецептов: фото передаётся файлом в поле image,
+    остальные поля — JSON-объектом в поле data.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        handlers = [RecipeImageUploadHandler(request)]
+        try:
+            data, files = DjangoParser(
+                meta, stream, handlers, encoding
+            ).parse()
+        except MultiPartParserError as error:
+            raise ParseError(f'Multipart form parse error - {error}')
+        if 'data' not in data:
+            return DataAndFiles(data, files)
+        try:
+            payload = json.loads(data['data'])
+        except ValueError:
+            raise ParseError(_('Поле data должно содержать JSON'))
+        if not isinstance(payload, dict):
+            raise ParseError(_('Поле data должно содержать JSON-объект'))
+        return DataAndFiles(payload, files.dict())
@@ -0,0 +1,197 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import OperationalError, connection, transaction
+from django.db.models import Exists, F, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from .models import RecipeIngredient
+
+FTS_TABLE = 'recipes_recipe_fts'
+BATCH_SIZE = 500
+
+INGREDIENT_NAMES = (
+    "SELECT {agg} FROM recipes_recipeingredient ri "
+    "JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+    "WHERE ri.recipe_id = r.id"
+)
+
+POSTGRES_UPDATE = (
+    "UPDATE recipes_recipe r SET search_vector = "
+    "setweight(to_tsvector(%s::regconfig, r.name), 'A') || "
+    "setweight(to_tsvector(%s::regconfig, COALESCE(("
+    + INGREDIENT_NAMES.format(agg="string_agg(i.name, ' ')")
+    + "), '')), 'B') || "
+    "setweight(to_tsvector(%s::regconfig, r.text), 'C')"
+)
+
+SQLITE_INSERT = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) "
+    "SELECT r.id, r.name, r.text, COALESCE(("
+    + INGREDIENT_NAMES.format(agg="group_concat(i.name, ' ')")
+    + "), '') FROM recipes_recipe r"
+)
+
+# Веса колонок name, text, ingredients для bm25 в FTS5.
+SQLITE_RANK = f'bm25({FTS_TABLE}, 10.0, 1.0, 4.0)'
+
+
+def has_fts_table(conn=connection):
+    if conn.vendor != 'sqlite':
+        return False
+    # Найденная таблица запоминается на соединении, чтобы не читать
+    # sqlite_master в каждом запросе.
+    if not getattr(conn, 'has_recipe_fts', False):
+        conn.has_recipe_fts = FTS_TABLE in conn.introspection.table_names()
+    return conn.has_recipe_fts
+
+
+def create_search_index(conn=connection):
+    """Создаёт поисковый индекс рецептов для текущей СУБД."""
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+                'ON recipes_recipe USING gin (search_vector)'
+            )
+        elif conn.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                    'USING fts5(name, text, ingredients, '
+                    "tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                # SQLite собран без FTS5: поиск идёт через icontains.
+                pass
+
+
+def drop_search_index(conn=connection):
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+        elif conn.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def refresh_search_index(recipe_ids=None, conn=connection):
+    """
+    Пересобирает поисковые документы рецептов из названия, описания
+    и названий ингредиентов. Без recipe_ids обновляются все рецепты.
+    """
+    if recipe_ids is None:
+        batches = [None]
+    else:
+        recipe_ids = list(recipe_ids)
+        batches = [
+            recipe_ids[start:start + BATCH_SIZE]
+            for start in range(0, len(recipe_ids), BATCH_SIZE)
+        ]
+    with conn.cursor() as cursor:
+        for batch in batches:
+            if conn.vendor == 'postgresql':
+                config = settings.SEARCH_CONFIG
+                if batch is None:
+                    cursor.execute(POSTGRES_UPDATE, [config] * 3)
+                else:
+                    cursor.execute(
+                        POSTGRES_UPDATE + ' WHERE r.id = ANY(%s)',
+                        [config] * 3 + [batch],
+                    )
+            elif has_fts_table(conn):
+                if batch is None:
+                    cursor.execute(f'DELETE FROM {FTS_TABLE}')
+                    cursor.execute(SQLITE_INSERT)
+                else:
+                    placeholders = ', '.join(['%s'] * len(batch))
+                    cursor.execute(
+                        f'DELETE FROM {FTS_TABLE} '
+                        f'WHERE rowid IN ({placeholders})', batch
+                    )
+                    cursor.execute(
+                        SQLITE_INSERT + f' WHERE r.id IN ({placeholders})',
+                        batch,
+                    )
+
+
+def flush_search_refresh():
+    recipe_ids = connection.search_refresh_ids
+    connection.search_refresh_ids = None
+    refresh_search_index(recipe_ids)
+
+
+def schedule_search_refresh(recipe_ids):
+    """
+    Обновляет индекс после фиксации транзакции, когда уже записаны
+    и ингредиенты рецепта. Все рецепты транзакции обновляются разом.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    pending = getattr(connection, 'search_refresh_ids', None)
+    # После отката транзакции отложенный вызов снимается вместе с ней.
+    if pending is not None and any(
+        callback[1] is flush_search_refresh
+        for callback in connection.run_on_commit
+    ):
+        pending.update(recipe_ids)
+        return
+    connection.search_refresh_ids = recipe_ids
+    transaction.on_commit(flush_search_refresh)
+
+
+def remove_from_search_index(recipe_id):
+    if has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+
+
+def fts5_query(term):
+    """
+    Превращает пользовательский ввод в безопасный запрос FTS5:
+    все слова обязательны, последнее ищется по префиксу.
+    """
+    words = re.findall(r'\w+', term)
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def search_recipes(queryset, term):
+    """Фильтрует рецепты по тексту и сортирует по релевантности."""
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            term, config=settings.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+    if has_fts_table():
+        query = fts5_query(term)
+        if not query:
+            return queryset.none()
+        # Соединение с виртуальной таблицей, а не подзапрос на каждую
+        # строку: FTS5 вычисляет MATCH и bm25 один раз. Чем меньше bm25,
+        # тем документ релевантнее.
+        # Ранг — настоящая аннотация, а не extra(select=...): по ней
+        # фильтрует курсорная пагинация.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = recipes_recipe.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[query],
+        ).annotate(
+            search_rank=RawSQL(SQLITE_RANK, (), output_field=FloatField())
+        ).order_by('search_rank', '-id')
+    return queryset.filter(
+        Q(name__icontains=term)
+        | Q(text__icontains=term)
+        | Exists(RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk'), ingredient__name__icontains=term
+        ))
+    )
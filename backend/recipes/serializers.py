@@ -1,11 +1,19 @@
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Manager
 from django.utils.translation import gettext_lazy as _
-from drf_extra_fields.fields import Base64ImageField
+from drf_extra_fields.fields import HybridImageField
 from rest_framework import serializers
 
+from .caching import get_recipe_fragments
+from .fields import BulkPrimaryKeyRelatedField, find_duplicates, resolve_pks
 from .models import (
     Favorite, Ingredient, Recipe, RecipeIngredient,
     ShoppingCart, Tag
 )
+from backend.routers import read_from_primary
+from users.models import Follow
 from users.serializers import BriefRecipeSerializer, UserSerializer
 
 
@@ -40,18 +48,41 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         )
 
 
+class AddIngredientListSerializer(serializers.ListSerializer):
+    """Проверяет id всех ингредиентов рецепта одним запросом."""
+
+    def to_internal_value(self, data):
+        ingredients = super().to_internal_value(data)
+        ids = [ingredient['id'] for ingredient in ingredients]
+        duplicates = find_duplicates(ids)
+        if duplicates:
+            raise serializers.ValidationError(
+                _('Ингредиенты должны быть уникальными!')
+                + f' {sorted(duplicates)}'
+            )
+        objects, missing = resolve_pks(Ingredient.objects.all(), ids)
+        if missing:
+            raise serializers.ValidationError(
+                _('Ингредиенты не найдены:') + f' {sorted(missing)}'
+            )
+        for ingredient, obj in zip(ingredients, objects):
+            ingredient['id'] = obj
+        return ingredients
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = AddIngredientListSerializer
 
 
 class RecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
-    tags = serializers.PrimaryKeyRelatedField(
+    image = HybridImageField()
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True)
     author = UserSerializer(read_only=True)
     ingredients = AddIngredientSerializer(many=True)
@@ -80,9 +111,7 @@ class RecipeSerializer(serializers.ModelSerializer):
                     f'{field}: ' + _('Обязательное поле')
                 )
 
-        ingredients = data.get('ingredients')
-        ingredients_list = []
-        for ingredient in ingredients:
+        for ingredient in data.get('ingredients'):
             required_ingredient_filds = [
                 'id', 'amount',
             ]
@@ -91,29 +120,14 @@ class RecipeSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError(
                         f'{field}: ' + _('Обязательное поле в ingredients')
                     )
-            ingredient_id = ingredient.get('id')
-            amount = ingredient.get('amount')
-            if ingredient_id in ingredients_list:
-                raise serializers.ValidationError({
-                    'ingredients': _('Ингредиенты должны быть уникальными!')
-                })
-            ingredients_list.append(ingredient_id)
-            if int(amount) <= 0:
+            if int(ingredient.get('amount')) <= 0:
                 raise serializers.ValidationError({
                     'amount': _('Неверное количество ингредиента')
                 })
 
-        tags = data.get('tags')
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise serializers.ValidationError({
-                    'tags': _('Тэги должны быть уникальными!')
-                })
-            tags_list.append(tag)
-
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
@@ -123,16 +137,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         self.create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_tags(validated_data.pop('tags'), instance)
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
+        self.update_tags(validated_data.pop('tags'), instance)
+        self.update_ingredients(validated_data.pop('ingredients'), instance)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return RecipeListSerializer(
-            instance, context={'request': self.context.get('request')}).data
+            instance, context={'request': request}).data
 
     @staticmethod
     def create_ingredients(ingredients, recipe):
@@ -148,16 +165,55 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def create_tags(tags, recipe):
-        for tag in tags:
-            recipe.tags.add(tag)
+        recipe.tags.add(*tags)
+
+    @staticmethod
+    def update_tags(tags, recipe):
+        new_ids = {tag.id for tag in tags}
+        current_ids = set(recipe.tags.values_list('id', flat=True))
+        if current_ids - new_ids:
+            recipe.tags.remove(*(current_ids - new_ids))
+        if new_ids - current_ids:
+            recipe.tags.add(*(new_ids - current_ids))
+
+    @staticmethod
+    def update_ingredients(ingredients, recipe):
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            amount.ingredient_id: amount
+            for amount in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, amount in current.items():
+            new_amount = amounts.get(ingredient_id)
+            if new_amount is not None and amount.amount != new_amount:
+                amount.amount = new_amount
+                changed.append(amount)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amounts[ingredient_id],
+            )
+            for ingredient_id in amounts.keys() - current.keys()
+        )
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Часть рецепта, одинаковая для всех пользователей."""
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     ingredients = serializers.SerializerMethodField(read_only=True)
-    is_favorited = serializers.SerializerMethodField(read_only=True)
-    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -169,22 +225,100 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'tags',
             'ingredients',
             'image',
+            'image_thumbnail',
+            'image_webp',
             'cooking_time',
-            'is_favorited',
-            'is_in_shopping_cart'
         )
 
     def get_ingredients(self, obj):
-        ingredients = RecipeIngredient.objects.filter(recipe=obj)
-        return RecipeIngredientSerializer(ingredients, many=True).data
+        return RecipeIngredientSerializer(obj.amounts.all(), many=True).data
+
+
+def build_recipe_fragments(recipes):
+    """
+    Сериализует рецепты без запроса: ссылки на изображения остаются
+    относительными, а is_subscribed автора не вычисляется. Рецепты
+    перечитываются с основной базы, чтобы в кэш не попали данные
+    отстающей реплики.
+    """
+    with read_from_primary():
+        primary = Recipe.objects.with_related().in_bulk(
+            [recipe.pk for recipe in recipes]
+        )
+    return {
+        recipe.pk: RecipeFragmentSerializer(
+            primary.get(recipe.pk, recipe)
+        ).data
+        for recipe in recipes
+    }
+
+
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        fragments = get_recipe_fragments(recipes, build_recipe_fragments)
+        return [
+            self.child.merge_user_data(recipe, fragments[recipe.pk])
+            for recipe in recipes
+        ]
+
+
+class RecipeListSerializer(RecipeFragmentSerializer):
+    """
+    Собирает рецепт из кэшированного фрагмента и флагов
+    текущего пользователя.
+    """
+    is_favorited = serializers.SerializerMethodField(read_only=True)
+    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(RecipeFragmentSerializer.Meta):
+        fields = RecipeFragmentSerializer.Meta.fields + (
+            'is_favorited',
+            'is_in_shopping_cart',
+        )
+        list_serializer_class = RecipeFragmentListSerializer
+
+    def to_representation(self, instance):
+        fragments = get_recipe_fragments([instance], build_recipe_fragments)
+        return self.merge_user_data(instance, fragments[instance.pk])
+
+    def merge_user_data(self, recipe, fragment):
+        data = OrderedDict(fragment)
+        request = self.context.get('request')
+        if request is not None:
+            for field in ('image', 'image_thumbnail', 'image_webp'):
+                if data[field]:
+                    data[field] = request.build_absolute_uri(data[field])
+        data['author'] = OrderedDict(
+            data['author'], is_subscribed=self.get_is_subscribed(recipe)
+        )
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        return data
+
+    def get_is_subscribed(self, obj):
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.author_id in subscriptions
+        user = self.context.get('request').user
+        if user.is_anonymous:
+            return False
+        return Follow.objects.filter(
+            user=user, author_id=obj.author_id
+        ).exists()
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return Recipe.objects.filter(favorites__user=user, id=obj.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -0,0 +1,373 @@
+import gc
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from .explain import FULL_SCAN_ALLOWED, seq_scan_tables
+from .images import needs_processing, process_recipe_image, variant_names
+from .loaders import iter_json_array, read_json_ingredients
+from .models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Tag
+)
+from users.models import Follow, User
+
+
+def create_user(number):
+    return User.objects.create_user(
+        username=f'user{number}', email=f'user{number}@example.com',
+        password='Test-password-123', first_name='Имя', last_name='Фамилия',
+    )
+
+
+def create_tags(start, count):
+    return [
+        Tag.objects.create(
+            name=f'Тег {number}', slug=f'tag{number}',
+            color=f'#{number:06d}',
+        )
+        for number in range(start, start + count)
+    ]
+
+
+def create_recipes(authors, tags, ingredients, count, start=0):
+    Recipe.objects.bulk_create(
+        Recipe(
+            name=f'Рецепт {start + number}',
+            text='Описание',
+            cooking_time=10,
+            image='recipe/sample.png',
+            author=authors[number % len(authors)],
+        )
+        for number in range(count)
+    )
+    # SQLite не возвращает id из bulk_create.
+    recipes = list(Recipe.objects.order_by('-id')[:count])[::-1]
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for number, recipe in enumerate(recipes)
+        for tag in (tags * 2)[number % len(tags):][:2]
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=2)
+        for number, recipe in enumerate(recipes)
+        for ingredient in ingredients[number % 3:][:3]
+    )
+    return recipes
+
+
+class RecipeListQueriesTest(APITestCase):
+    """Число запросов страницы рецептов не зависит от её размера."""
+    # count, страница, подписки пользователя.
+    WARM_QUERIES = 3
+    # Плюс перечитывание рецептов с автором, теги и ингредиенты.
+    COLD_QUERIES = WARM_QUERIES + 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        authors = [create_user(number) for number in range(1, 6)]
+        tags = create_tags(0, 4)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        )
+        ingredients = list(Ingredient.objects.all())
+        recipes = create_recipes(authors, tags, ingredients, 120)
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, author=author) for author in authors[:2]
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::3]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, limit, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return response.data['results']
+
+    def test_page_queries(self):
+        for limit in (10, 100):
+            with self.subTest(limit=limit):
+                cache.clear()
+                cold = self.get_page(limit, self.COLD_QUERIES)
+                warm = self.get_page(limit, self.WARM_QUERIES)
+                self.assertEqual(cold, warm)
+
+    def test_user_flags_with_cached_fragments(self):
+        self.get_page(10, self.COLD_QUERIES)
+        subscriptions = self.user.get_subscriptions()
+        favorites = set(
+            self.user.favorites.values_list('recipe_id', flat=True)
+        )
+        for recipe in self.get_page(10, self.WARM_QUERIES):
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['id'] in subscriptions,
+            )
+            self.assertEqual(
+                recipe['is_favorited'], recipe['id'] in favorites
+            )
+            self.assertEqual(len(recipe['tags']), 2)
+            self.assertEqual(len(recipe['ingredients']), 3)
+        self.client.force_authenticate(None)
+        for recipe in self.get_page(10, 2):
+            self.assertFalse(recipe['author']['is_subscribed'])
+            self.assertFalse(recipe['is_favorited'])
+
+
+class RecipeTagFilterTest(APITestCase):
+    """Фильтр по нескольким тегам не дублирует рецепты."""
+    SLUGS = ('tag0', 'tag1', 'tag2')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [create_user(number) for number in range(3)]
+        cls.tags = create_tags(0, 4)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(5)
+        )
+        cls.ingredients = list(Ingredient.objects.all())
+        create_recipes(cls.authors, cls.tags, cls.ingredients, 30)
+
+    def setUp(self):
+        cache.clear()
+
+    def expected_ids(self):
+        return set(Recipe.objects.filter(
+            tags__slug__in=self.SLUGS
+        ).values_list('id', flat=True))
+
+    def get_page(self, page, limit=7):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/', {
+                'tags': self.SLUGS, 'limit': limit, 'page': page,
+            })
+        self.assertEqual(response.status_code, 200)
+        return response.data, queries.captured_queries
+
+    def collect_ids(self):
+        ids = []
+        page = 1
+        while page:
+            data, _ = self.get_page(page)
+            ids.extend(recipe['id'] for recipe in data['results'])
+            page = page + 1 if data['next'] else None
+        return ids
+
+    def test_pages_without_duplicates(self):
+        ids = self.collect_ids()
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), self.expected_ids())
+        data, _ = self.get_page(1)
+        self.assertEqual(data['count'], len(ids))
+
+    def test_queries_do_not_grow(self):
+        _, before = self.get_page(1)
+        create_tags(4, 20)
+        create_recipes(
+            self.authors, list(Tag.objects.all()), self.ingredients, 200,
+            start=30,
+        )
+        cache.clear()
+        _, after = self.get_page(1)
+        self.assertEqual(len(after), len(before))
+        for query in after:
+            self.assertNotIn('DISTINCT', query['sql'])
+        ids = self.collect_ids()
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), self.expected_ids())
+
+
+class AccessPathIndexTest(APITestCase):
+    """Основные запросы API читают таблицы по индексам, по EXPLAIN."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(0)
+        cls.authors = [create_user(number) for number in range(1, 8)]
+        tags = create_tags(0, 4)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        ingredients = list(Ingredient.objects.all())
+        recipes = create_recipes(cls.authors, tags, ingredients, 200)
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, author=author) for author in cls.authors
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::5]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::7]
+        )
+        cls.recipe = recipes[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_endpoints_avoid_seq_scans(self):
+        author = self.authors[0]
+        paths = (
+            '/api/recipes/',
+            f'/api/recipes/?author={author.id}',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/recipes/?tags=tag0&tags=tag1',
+            f'/api/recipes/{self.recipe.id}/',
+            '/api/recipes/download_shopping_cart/',
+            '/api/users/',
+            f'/api/users/{author.id}/',
+            '/api/users/subscriptions/',
+        )
+        for path in paths:
+            with self.subTest(path=path):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    set(seq_scan_tables(queries.captured_queries))
+                    - FULL_SCAN_ALLOWED,
+                    set(),
+                )
+
+
+class RecipeImageVariantsTest(TestCase):
+    """Варианты фото с одинаковой основой имени не пересекаются."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = create_user(0)
+
+    def create_recipe(self, name, image_format, color):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), color).save(buffer, image_format)
+        image = default_storage.save(name, ContentFile(buffer.getvalue()))
+        return Recipe.objects.create(
+            name=name, text='Описание', cooking_time=10, image=image,
+            author=self.author,
+        )
+
+    def test_same_stem_images(self):
+        first = self.create_recipe('recipe/photo.png', 'PNG', 'red')
+        second = self.create_recipe('recipe/photo.jpg', 'JPEG', 'blue')
+        # Чужой файл с именем будущего варианта не должен пропасть.
+        stale_name = variant_names(first.image.name)[0]
+        default_storage.save(stale_name, ContentFile(b'stale'))
+        for recipe in (first, second):
+            process_recipe_image(recipe.pk, recipe.image.name)
+            recipe.refresh_from_db()
+            self.assertFalse(needs_processing(recipe))
+        names = {
+            first.image_thumbnail.name, first.image_webp.name,
+            second.image_thumbnail.name, second.image_webp.name,
+        }
+        self.assertEqual(len(names), 4)
+        self.assertNotIn(stale_name, names)
+        with default_storage.open(stale_name) as stale:
+            self.assertEqual(stale.read(), b'stale')
+        for name in names:
+            self.assertTrue(default_storage.exists(name))
+        for recipe, red in ((first, True), (second, False)):
+            with default_storage.open(recipe.image_thumbnail.name) as file:
+                pixel = Image.open(file).getpixel((0, 0))
+            self.assertEqual(pixel[0] > 128, red)
+
+
+class JsonIngredientsReaderTest(SimpleTestCase):
+    """Потоковое чтение JSON не принимает обрезанные и битые файлы."""
+    ITEMS = (
+        '[{"name": "Соль", "measurement_unit": "г"},'
+        ' {"model": "recipes.ingredient",'
+        ' "fields": {"name": "Вода", "measurement_unit": "мл"}}]'
+    )
+
+    def read(self, text):
+        return list(read_json_ingredients(StringIO(text)))
+
+    def test_whole_file(self):
+        self.assertEqual(
+            self.read(self.ITEMS), [('Соль', 'г'), ('Вода', 'мл')]
+        )
+        items = list(iter_json_array(StringIO(self.ITEMS), chunk_size=7))
+        self.assertEqual(len(items), 2)
+
+    def test_invalid_files(self):
+        invalid = (
+            '',
+            '{"name": "Соль"}',
+            self.ITEMS[:-1],
+            self.ITEMS[:30],
+            self.ITEMS.replace('},', '}}'),
+            self.ITEMS.replace('"Вода"', 'Вода'),
+            self.ITEMS + ' []',
+            '[1]',
+            '[{"fields": []}]',
+            '[{"name": null, "measurement_unit": "г"}]',
+        )
+        for text in invalid:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    self.read(text)
+
+    def test_item_size_is_limited(self):
+        text = '[{"name": "' + 'с' * 1000
+        with self.assertRaisesMessage(ValueError, 'длиннее 500'):
+            list(iter_json_array(
+                StringIO(text), chunk_size=100, max_item_size=500
+            ))
+
+
+class RecipeImageUploadTest(APITestCase):
+    """Отклонённая загрузка фото не оставляет временных файлов."""
+
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        settings_override = override_settings(
+            FILE_UPLOAD_TEMP_DIR=temp_dir, RECIPE_IMAGE_MAX_SIZE=1024,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.temp_dir = temp_dir
+        self.client.force_authenticate(create_user(0))
+
+    def test_rejected_uploads(self):
+        uploads = (
+            (b'not an image' * 10, 415),
+            (b'\x89PNG\r\n\x1a\n' + b'0' * 2048, 413),
+        )
+        for content, status_code in uploads:
+            with self.subTest(status_code=status_code):
+                image = SimpleUploadedFile('photo.png', content, 'image/png')
+                response = self.client.post(
+                    '/api/recipes/', {'data': '{}', 'image': image},
+                    format='multipart',
+                )
+                self.assertEqual(response.status_code, status_code)
+                gc.collect()
+                self.assertEqual(os.listdir(self.temp_dir), [])
@@ -1,9 +1,49 @@
-def create_shopping_list(ingredients):
-    shopping_list = 'Список покупок \n\n'
+import csv
+import json
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_txt(ingredients):
+    yield 'Список покупок \n\n'
     for ingredient in ingredients:
-        shopping_list += (
+        yield (
             f"{ingredient['ingredient__name']} "
             f"({ingredient['ingredient__measurement_unit']}) - "
             f"{ingredient['amount__sum']}\n"
         )
-    return shopping_list
+
+
+def shopping_list_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['amount__sum'],
+        ))
+
+
+def shopping_list_json(ingredients):
+    yield '['
+    for index, ingredient in enumerate(ingredients):
+        item = json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['amount__sum'],
+        }, ensure_ascii=False)
+        yield f',{item}' if index else item
+    yield ']'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (shopping_list_txt, 'text/plain; charset=utf-8'),
+    'csv': (shopping_list_csv, 'text/csv; charset=utf-8'),
+    'json': (shopping_list_json, 'application/json; charset=utf-8'),
+}
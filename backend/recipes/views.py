@@ -1,27 +1,33 @@
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from .catalog import get_catalog
 from .filters import IngredientSearchFilter, RecipeFilter
+from .mixins import ConditionalCacheMixin
 from .models import (
     Favorite, Ingredient, Recipe, RecipeIngredient,
     ShoppingCart, Tag
 )
 from .pagination import CustomPageNumberPagination
+from .parsers import RecipeMultiPartParser
 from .permissions import IsAuthorOrAdmin
 from .serializers import (
     FavoriteSerializer, IngredientSerializer, RecipeListSerializer,
     RecipeSerializer, ShoppingCartSerializer, TagSerializer
 )
-from .utils import create_shopping_list
+from .utils import SHOPPING_LIST_FORMATS
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny, ]
@@ -29,23 +35,45 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny, ]
     http_method_names = ['get', ]
     pagination_class = None
     filter_backends = [IngredientSearchFilter]
-    search_fields = ('^name',)
+
+    def filter_queryset(self, queryset):
+        if self.action == 'list' and settings.INGREDIENT_CATALOG_CACHE:
+            return get_catalog().search(
+                IngredientSearchFilter().get_search_term(self.request),
+                settings.INGREDIENT_SEARCH_LIMIT,
+            )
+        return super().filter_queryset(queryset)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     pagination_class = CustomPageNumberPagination
+    parser_classes = [JSONParser, RecipeMultiPartParser]
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return queryset.with_user_flags(self.request.user)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if self.action in ('list', 'retrieve') and user.is_authenticated:
+            context['subscriptions'] = user.get_subscriptions()
+        return context
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeListSerializer
@@ -63,6 +91,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated],
             url_path='favorite')
+    @transaction.atomic
     def create_favorite(self, request, pk=None):
         data = {'user': request.user.id, 'recipe': pk}
         serializer = FavoriteSerializer(
@@ -84,6 +113,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated],
             url_path='shopping_cart')
+    @transaction.atomic
     def add_to_shopping_cart(self, request, pk=None):
         data = {'user': request.user.id, 'recipe': pk}
         serializer = ShoppingCartSerializer(
@@ -102,22 +132,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
         cart.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format выбирает формат файла списка покупок,
+        # а не рендерер DRF.
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'error': 'Доступные форматы: '
+                          + ', '.join(SHOPPING_LIST_FORMATS)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         ingredients = RecipeIngredient.objects.filter(
             recipe__carts__user=request.user).values(
                 'ingredient__name',
                 'ingredient__measurement_unit'
-        ).annotate(Sum('amount'))
+        ).annotate(Sum('amount')).order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        )
 
-        if not ingredients:
+        if not ingredients.exists():
             return Response(
                 {'error': 'Ваша корзина пуста'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        return HttpResponse(
-            create_shopping_list(ingredients),
-            content_type='text/plain'
+        generator, content_type = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            generator(ingredients.iterator()),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{file_format}"'
         )
+        return response
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_KEY = 'auth-token:{}'
+USER_TOKEN_KEY = 'auth-user-token:{}'
+
+
+def token_cache_key(key):
+    # Сам токен в ключ кэша не попадает.
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def forget_user(user_id):
+    """Сбрасывает закэшированную аутентификацию пользователя."""
+    user_key = USER_TOKEN_KEY.format(user_id)
+    token_key = cache.get(user_key)
+    if token_key is not None:
+        cache.delete_many([token_key, user_key])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, хранящая пару токен → пользователь в кэше
+    AUTH_TOKEN_CACHE_TIMEOUT секунд. Записи сбрасываются сигналами
+    при удалении токена и сохранении пользователя. С локальным кэшем
+    сброс не дошёл бы до других процессов, и отозванный токен ещё
+    принимался бы ими, поэтому тогда токен каждый раз проверяется в БД.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.CACHE_IS_SHARED:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            timeout = settings.AUTH_TOKEN_CACHE_TIMEOUT
+            cache.set_many({
+                cache_key: (user, token),
+                USER_TOKEN_KEY.format(user.pk): cache_key,
+            }, timeout)
+            return user, token
+        user, token = cached
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, token
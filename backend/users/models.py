@@ -12,6 +12,16 @@ class User(AbstractUser):
     password = models.CharField(max_length=128, blank=False)
     email = models.EmailField(unique=True)
     role = models.CharField(max_length=50, choices=ROLES, default='user')
+    recipes_count = models.PositiveIntegerField(
+        verbose_name=_('Количество рецептов'),
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name=_('Количество подписчиков'),
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = [
         'username', 'first_name', 'last_name', 'password',
@@ -19,11 +29,18 @@ class User(AbstractUser):
 
     class Meta(AbstractUser.Meta):
         ordering = ('-date_joined',)
+        indexes = (
+            models.Index(fields=('-date_joined',), name='user_joined_idx'),
+        )
 
     @property
     def is_admin(self):
         return self.role == 'admin'
 
+    def get_subscriptions(self):
+        """Возвращает множество id авторов, на которых подписан."""
+        return set(self.follower.values_list('author_id', flat=True))
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -53,3 +70,6 @@ class Follow(models.Model):
                 name='following_me',
             ),
         )
+        indexes = (
+            models.Index(fields=('author', 'user'), name='follow_author_idx'),
+        )
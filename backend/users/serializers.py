@@ -39,6 +39,9 @@ class UserSerializer(serializers.ModelSerializer):
         return value
 
     def get_is_subscribed(self, obj):
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.id in subscriptions
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -75,29 +78,33 @@ class ChangePasswordSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         instance.set_password(validated_data['new_password'])
-        instance.save()
+        instance.save(update_fields=('password',))
         return instance
 
 
 class BriefRecipeSerializer(serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, obj):
+        image = obj.image_thumbnail or obj.image
+        if not image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return image.url
+        return request.build_absolute_uri(image.url)
+
 
 class SubscriptionsSerilaizer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(source='author.id')
-    email = serializers.ReadOnlyField(source='author.email')
-    username = serializers.ReadOnlyField(source='author.username')
-    first_name = serializers.ReadOnlyField(source='author.first_name')
-    last_name = serializers.ReadOnlyField(source='author.last_name')
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
-    is_subscribed = serializers.SerializerMethodField(read_only=True)
+    is_subscribed = serializers.BooleanField(read_only=True)
 
     class Meta:
-        model = Follow
+        model = User
         fields = (
             'email',
             'id',
@@ -108,25 +115,9 @@ class SubscriptionsSerilaizer(serializers.ModelSerializer):
             'recipes',
             'recipes_count',
         )
-
-    def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if not user:
-            return False
-        return Follow.objects.filter(user=user, author=obj.author_id).exists()
+        read_only_fields = fields
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = Recipe.objects.filter(
-                author=obj.author_id).all()[:(int(recipes_limit))]
-        else:
-            recipes = Recipe.objects.filter(author=obj.author_id).all()
-        context = {'request': request}
-        return BriefRecipeSerializer(recipes, many=True,
+        context = {'request': self.context.get('request')}
+        return BriefRecipeSerializer(obj.feed_recipes, many=True,
                                      context=context).data
-
-    @staticmethod
-    def get_recipes_count(obj):
-        return Recipe.objects.filter(author=obj.author_id).count()
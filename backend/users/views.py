@@ -1,3 +1,6 @@
+from django.db import transaction
+from django.db.models import BooleanField, F, Prefetch, Value
+from django.db.models import prefetch_related_objects
 from django.utils.translation import gettext_lazy as _
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
@@ -10,6 +13,7 @@ from .serializers import (
     ChangePasswordSerializer, SubscriptionsSerilaizer,
     UserMeSerializer, UserSerializer
 )
+from recipes.models import Recipe
 from recipes.pagination import CustomPageNumberPagination
 
 
@@ -22,6 +26,35 @@ class UserViewSet(viewsets.ModelViewSet):
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        user = self.request.user
+        if self.action in ('list', 'retrieve') and user.is_authenticated:
+            context['subscriptions'] = user.get_subscriptions()
+        return context
+
+    @staticmethod
+    def get_subscriptions_queryset(user):
+        return User.objects.filter(following__user=user).annotate(
+            follow_id=F('following__id'),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('-follow_id')
+
+    def get_subscriptions_data(self, authors):
+        recipes = Recipe.objects.filter(author__in=authors)
+        recipes_limit = self.request.query_params.get('recipes_limit', '')
+        if recipes_limit.isdigit():
+            recipes = recipes.first_per_author(int(recipes_limit))
+        prefetch_related_objects(
+            authors,
+            Prefetch('recipes', queryset=recipes, to_attr='feed_recipes'),
+        )
+        return SubscriptionsSerilaizer(
+            authors,
+            context={'request': self.request},
+            many=True
+        ).data
+
     @action(detail=False, methods=('get', ),
             permission_classes=(IsAuthenticated,),
             serializer_class=UserMeSerializer)
@@ -43,18 +76,15 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        user = request.user
-        queryset = Follow.objects.filter(user=user)
-        paginator = self.paginate_queryset(queryset)
-        serializer = SubscriptionsSerilaizer(
-            paginator,
-            context={'request': request},
-            many=True
+        queryset = self.get_subscriptions_queryset(request.user)
+        authors = self.paginate_queryset(queryset)
+        return self.get_paginated_response(
+            self.get_subscriptions_data(authors)
         )
-        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post', ],
             permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def subscribe(self, request, id=None):
         user = request.user
         author = get_object_or_404(User, id=id)
@@ -70,11 +100,12 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        follow = Follow.objects.create(user=user, author=author)
-        serializer = SubscriptionsSerilaizer(
-            follow, context={'request': request}
+        Follow.objects.create(user=user, author=author)
+        author = self.get_subscriptions_queryset(user).get(id=author.id)
+        return Response(
+            self.get_subscriptions_data([author])[0],
+            status=status.HTTP_201_CREATED
         )
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
     def unsubscribe(self, request, id=None):